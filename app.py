@@ -1,9 +1,12 @@
 import os
 import re
+from collections import defaultdict
 from datetime import datetime, date
+from io import BytesIO
 from shutil import copyfile
 from tempfile import TemporaryDirectory
 
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
@@ -14,6 +17,33 @@ HEADER_ROW = 2        # green header row in template (dates + สาย + summar
 ID_COL = 2            # column B in template (employee ID, 1-based index)
 FIRST_DATE_COL = 4    # column D in template (first date column, 1-based index)
 
+# J..P reason columns in the day file -> text written into the template
+REASON_LABELS = {
+    "no_in": "ไม่ตอกเข้า",
+    "no_out": "ไม่ตอกออก",
+    "absent": "ขาดงาน",
+    "sick": "ลาป่วย",
+    "personal": "ลากิจ",
+    "vacation": "พักร้อน",
+    "ordination": "บวชคลอด",
+}
+
+# summary column key -> word counted in the filled date cells
+SUMMARY_WORDS = {
+    "absent": "ขาดงาน",
+    "sick": "ป่วย",
+    "personal": "กิจ",
+    "vacation": "พักร้อน",
+    "ordination": "บวช",
+}
+
+# explicit dd/mm/yyyy date text (day, month, year groups)
+_DMY = re.compile(r"^(\d{2})/(\d{2})/(\d{4})$")
+
+# employee id: 5+ digits, possibly written as an integer-valued float
+_EMP_ID = re.compile(r"\d{5,}")
+_INT_TEXT = re.compile(r"^(\d+)\.0$")
+
 
 # ----------------------------------------
 # Helpers (same logic as your working debug.py)
@@ -35,9 +65,9 @@ def parse_date_cell(x):
         return None
 
     # explicit dd/mm/yyyy
-    if re.match(r"^\d{2}/\d{2}/\d{4}$", s):
-        d, m, y = map(int, s.split("/"))
-        return date(y, m, d)
+    m = _DMY.match(s)
+    if m:
+        return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
 
     # fallback: let pandas try
     try:
@@ -49,54 +79,49 @@ def parse_date_cell(x):
     except Exception:
         return None
 
-def normalize_emp_id(x):
-    if pd.isna(x):
-        return None
-
-    # If it's a number, keep only if it's an integer-like and long enough
-    if isinstance(x, (int,)):
-        s = str(x)
-        return s if re.fullmatch(r"\d{5,}", s) else None
-
-    if isinstance(x, (float,)):
-        # 5900102.0 -> keep as 5900102
-        if float(x).is_integer():
-            s = str(int(x))
-            return s if re.fullmatch(r"\d{5,}", s) else None
-        # 20.14 -> junk
-        return None
-
-    # Otherwise treat as string
-    s = str(x).strip()
-
-    # Handle "5900102.0" stored as text
-    m = re.fullmatch(r"(\d+)\.0", s)
-    if m:
-        s = m.group(1)
+def normalize_emp_ids(s: pd.Series) -> pd.Series:
+    """
+    Clean the raw employee-id column in one vectorized pass: keep ids of 5+
+    digits ("5900102.0" -> "5900102"), everything else (names, totals,
+    20.14, ...) becomes NA.
+    """
+    text = s.astype("string").str.strip().str.replace(_INT_TEXT, r"\1", regex=True)
+    return text.where(text.str.fullmatch(_EMP_ID, na=False))
 
-    if re.fullmatch(r"\d{5,}", s):
-        return s
 
-    return None
+def ffill_column(s: pd.Series) -> pd.Series:
+    """
+    Forward-fill with numpy: every row takes the nearest non-null value above it
+    (index of the last non-null row via np.maximum.accumulate, then one gather).
+    """
+    a = s.to_numpy()
+    idx = np.where(pd.notna(a), np.arange(len(a)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    return pd.Series(a[idx], index=s.index, name=s.name)
 
 
 def load_day_file(path: str) -> pd.DataFrame:
     print(f"Loading day file: {path}")
-    df = pd.read_excel(path, header=None)
+    # only A..Q are used; a callable usecols also works for narrower files
+    df = pd.read_excel(path, header=None, engine="openpyxl", usecols=lambda c: c < 17)
 
     # 🔧 CLEAN emp_id column BEFORE ffill
-    df[0] = df[0].apply(normalize_emp_id)
-    df[0] = df[0].ffill()
+    df[0] = normalize_emp_ids(df[0])
+    df[0] = ffill_column(df[0])
 
     # forward fill name
-    df[1] = df[1].ffill()
+    df[1] = ffill_column(df[1])
 
-    # parse dates
+    # parse dates: the same few dates repeat for every employee, so parse each
+    # distinct value once and map it back onto the column
+    # (pandas < 3 parses into ns Timestamps, which can't hold BE years like
+    # 2568, so a whole-column pd.to_datetime would give NaT there)
     df["date_raw"] = df[2]
-    df["date"] = df["date_raw"].apply(parse_date_cell)
+    parsed_dates = {v: parse_date_cell(v) for v in df["date_raw"].dropna().unique()}
+    df["date"] = df["date_raw"].map(parsed_dates)
 
     print("  sample raw date values (first 10):", list(df["date_raw"].head(10)))
-    unique_dates = sorted({d for d in df["date"] if isinstance(d, date)})
+    unique_dates = sorted({d for d in parsed_dates.values() if isinstance(d, date)})
     print("  parsed unique dates:", unique_dates)
 
     # keep only rows that have a valid date
@@ -106,11 +131,11 @@ def load_day_file(path: str) -> pd.DataFrame:
     print("  rows kept (with valid date):", len(df_emp))
     print("  unique employees in file:", df_emp[0].nunique())
 
-    # rename useful columns
+    # rename useful columns (C is already copied to "date_raw" above; renaming
+    # it too would give two "date_raw" columns, which pd.concat rejects)
     rename_map = {
         0: "emp_id",
         1: "name",
-        2: "date_raw",
         3: "shift",
         4: "time_in",
         5: "time_out",
@@ -132,10 +157,12 @@ def load_day_file(path: str) -> pd.DataFrame:
     if 16 in df_emp.columns:
         rename_map[16] = "comment"
 
-    df_emp = df_emp.rename(columns=rename_map)
+    df_emp = df_emp.rename(columns=rename_map).assign(
+        emp_id=lambda d: d["emp_id"].astype("string").str.strip(),
+        name=lambda d: d["name"].astype("string").str.strip(),
+    )
 
-    df_emp["emp_id"] = df_emp["emp_id"].astype(str).str.strip()
-    df_emp["name"] = df_emp["name"].astype(str).str.strip()
+    df_emp["reason_text"] = build_reason_text(df_emp)
 
     # for debug: show some comment rows
     if "comment" in df_emp.columns:
@@ -146,13 +173,116 @@ def load_day_file(path: str) -> pd.DataFrame:
     return df_emp
 
 
-def fill_template_from_days(template_path: str, day_files: list[str], output_path: str):
+def build_reason_text(df: pd.DataFrame) -> np.ndarray:
+    """
+    Build the reason text (e.g. "ไม่ตอกเข้า ลาป่วย(2)") for every row at once
+    from the numeric reason columns. Rows without any reason get "".
+    """
+    pieces = []
+    for key, label in REASON_LABELS.items():
+        if key not in df.columns:
+            continue
+        v = pd.to_numeric(df[key], errors="coerce").fillna(0).to_numpy(dtype=float)
+        # a column only holds a handful of distinct counts: format those once
+        # and gather back to every row
+        uniq, inv = np.unique(v, return_inverse=True)
+        num_str = np.trunc(uniq).astype(np.int64).astype(str)
+        with_count = np.char.add(np.char.add(label + "(", num_str), ")")
+        piece = np.where(uniq == 1, label, with_count).astype(object)
+        piece[uniq == 0] = ""
+        pieces.append(piece[inv.reshape(-1)])
+
+    if not pieces:
+        return np.full(len(df), "", dtype=object)
+
+    return np.array(
+        [" ".join(filter(None, row)) for row in zip(*pieces)],
+        dtype=object,
+    )
+
+
+@st.cache_data(show_spinner=False)
+def parse_template(template_bytes: bytes) -> tuple[dict, dict, int | None, dict]:
+    """
+    Read the template layout: (date_col_map, index_by_id, late_col_idx, summary_cols).
+    Cached on the template bytes, so pressing Generate again with the same
+    template skips this pass. Only values are needed, so the workbook is opened
+    read-only with cached formula results (no styles / merges / cell graph).
+    """
+    wb = load_workbook(BytesIO(template_bytes), read_only=True, data_only=True)
+    try:
+        ws = wb.active
+
+        # ---------- Build date_col_map and find 'สาย (นาที)' + summary columns ----------
+        date_col_map = {}     # {date: col_index}
+        late_col_idx = None
+
+        summary_cols = {
+            "absent": None,
+            "sick": None,
+            "personal": None,
+            "vacation": None,
+            "ordination": None,
+        }
+
+        # one pass over the header row, values only (no Cell objects)
+        header = next(ws.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+
+        for c, header_val in enumerate(header, start=1):
+            if header_val is None:
+                continue
+            text = str(header_val)
+
+            if c >= FIRST_DATE_COL:
+                d = parse_date_cell(header_val)
+                if isinstance(d, date):
+                    date_col_map[d] = c
+
+                if late_col_idx is None and ("สาย" in text or "late" in text.lower()):
+                    late_col_idx = c
+
+            # summary headers on the right
+            if "ขาดงาน" in text:
+                summary_cols["absent"] = c
+            elif "ลาป่วย" in text:
+                summary_cols["sick"] = c
+            elif "ลากิจ" in text:
+                summary_cols["personal"] = c
+            elif "พักร้อน" in text:
+                summary_cols["vacation"] = c
+            elif "บวช" in text:
+                summary_cols["ordination"] = c
+
+        # ---------- Index employees by ID ----------
+        index_by_id = {}
+        id_rows = ws.iter_rows(min_row=HEADER_ROW + 1, min_col=ID_COL, max_col=ID_COL, values_only=True)
+        for r, (emp_id_val,) in enumerate(id_rows, start=HEADER_ROW + 1):
+            if emp_id_val is None:
+                continue
+            emp_id = str(emp_id_val).strip()
+            if emp_id:
+                index_by_id[emp_id] = r
+    finally:
+        wb.close()
+
+    return date_col_map, index_by_id, late_col_idx, summary_cols
+
+
+def fill_template_from_days(
+    template_path: str,
+    day_files: list[str],
+    output_path: str,
+    template_bytes: bytes | None = None,
+):
     """
     Copy template.xlsx to output_path and fill:
       * per-day time_in in date columns
       * yellow highlight + text (reasons or comments) when no time_in
       * accumulate late minutes into 'สาย (นาที)'
       * final summary columns: ขาดงาน / ลาป่วย / ลากิจ / พักร้อน / บวชคลอด
+
+    template_bytes: contents of template_path when the caller already has them
+    (e.g. the Streamlit upload); otherwise the file is read from disk.
     """
     # delete old output
     if os.path.exists(output_path):
@@ -160,51 +290,11 @@ def fill_template_from_days(template_path: str, day_files: list[str], output_pat
 
     copyfile(template_path, output_path)
 
-    wb = load_workbook(output_path)
-    ws = wb.active
-
-    # ---------- 1) Build date_col_map and find 'สาย (นาที)' + summary columns ----------
-    date_col_map = {}     # {date: col_index}
-    late_col_idx = None
-
-    summary_cols = {
-        "absent": None,
-        "sick": None,
-        "personal": None,
-        "vacation": None,
-        "ordination": None,
-    }
-
-    max_col = ws.max_column
-
-    for c in range(FIRST_DATE_COL, max_col + 1):
-        header_val = ws.cell(row=HEADER_ROW, column=c).value
-        if header_val is None:
-            continue
-        d = parse_date_cell(header_val)
-        if isinstance(d, date):
-            date_col_map[d] = c
-
-        text = str(header_val)
-        if late_col_idx is None and ("สาย" in text or "late" in text.lower()):
-            late_col_idx = c
-
-    # also search for summary headers on the right
-    for c in range(1, max_col + 1):
-        v = ws.cell(row=HEADER_ROW, column=c).value
-        if v is None:
-            continue
-        text = str(v)
-        if "ขาดงาน" in text:
-            summary_cols["absent"] = c
-        elif "ลาป่วย" in text:
-            summary_cols["sick"] = c
-        elif "ลากิจ" in text:
-            summary_cols["personal"] = c
-        elif "พักร้อน" in text:
-            summary_cols["vacation"] = c
-        elif "บวช" in text:
-            summary_cols["ordination"] = c
+    # ---------- 1) Template layout (cached per template file) ----------
+    if template_bytes is None:
+        with open(template_path, "rb") as f:
+            template_bytes = f.read()
+    date_col_map, index_by_id, late_col_idx, summary_cols = parse_template(template_bytes)
 
     print("Date headers found in template:")
     for d, col in date_col_map.items():
@@ -215,161 +305,150 @@ def fill_template_from_days(template_path: str, day_files: list[str], output_pat
     if not date_col_map:
         raise RuntimeError("ไม่พบหัวคอลัมน์วันที่ใน template")
 
-    # ---------- 2) Index employees by ID ----------
-    index_by_id = {}
-    for r in range(HEADER_ROW + 1, ws.max_row + 1):
-        emp_id_val = ws.cell(row=r, column=ID_COL).value
-        if emp_id_val is None:
-            continue
-        emp_id = str(emp_id_val).strip()
-        if emp_id:
-            index_by_id[emp_id] = r
-
     print(f"Number of employees in template (unique IDs): {len(index_by_id)}")
 
-    # ---------- 3) Fill per-day values ----------
-    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-    total_matches = 0
+    wb = load_workbook(output_path)
+    ws = wb.active
 
-    for path in day_files:
-        df = load_day_file(path)
+    # ---------- 2) Collect per-day edits ----------
+    # edits[row_idx][col_idx] = (value, fill); nothing touches the sheet until
+    # every day file has been processed, then each cell is written once.
+    # One shared fill: openpyxl stores it once in the workbook's style table,
+    # and each highlighted cell keeps its own font / border / number format.
+    yellow_fill = PatternFill(start_color="FFFFFF00", end_color="FFFFFF00", fill_type="solid")
+    edits = defaultdict(dict)
+    total_matches = 0
 
-        for _, row in df.iterrows():
-            emp_id = str(row["emp_id"]).strip()
-            d = row["date"]
-            if not isinstance(d, date):
-                continue
+    df = pd.concat([load_day_file(path) for path in day_files], ignore_index=True)
+
+    # template row/column for every day row, looked up column-wise; rows whose
+    # employee or date is not in the template are dropped here
+    df["row_idx"] = df["emp_id"].map(index_by_id).astype("Int64")
+    df["col_idx"] = df["date"].map(date_col_map).astype("Int64")
+    df = df.dropna(subset=["row_idx", "col_idx"])
+
+    # late minutes: every remaining row counts, across all files
+    late_by_row = {}
+    if late_col_idx is not None and "late" in df.columns:
+        late = pd.to_numeric(df["late"], errors="coerce")
+        totals = late.groupby(df["row_idx"]).sum(min_count=1)
+        late_by_row = dict(zip(totals.index.tolist(), totals.tolist()))
+
+    # one entry per template cell; a later file wins over an earlier one
+    df = df.drop_duplicates(["row_idx", "col_idx"], keep="last")
+
+    # pull the needed columns out once instead of building a pandas Series
+    # per row with iterrows()
+    n = len(df)
+    empty = np.full(n, None, dtype=object)
+    row_idxs = df["row_idx"].tolist()
+    col_idxs = df["col_idx"].tolist()
+    shifts = df["shift"].to_numpy() if "shift" in df.columns else empty
+    time_ins = df["time_in"].to_numpy() if "time_in" in df.columns else empty
+    comments = df["comment"].to_numpy() if "comment" in df.columns else empty
+    reason_texts = df["reason_text"].to_numpy()
+
+    for row_idx, col_idx, time_in, shift, comment, reason_text in zip(
+        row_idxs, col_idxs, time_ins, shifts, comments, reason_texts
+    ):
+        # ---------- choose text for that date cell ----------
+        if pd.notna(time_in):
+            # normal case: has time-in
+            edits[row_idx][col_idx] = (str(time_in), None)
+            total_matches += 1
+            continue
 
-            col_idx = date_col_map.get(d)
-            if col_idx is None:
-                # date not in template
-                continue
+        # no time-in → yellow highlight
+        shift = str(shift).upper().strip()
 
-            row_idx = index_by_id.get(emp_id)
-            if row_idx is None:
-                # employee not in template
-                continue
+        # --- 1) OFF day → หยุดวันอาทิตย์ ---
+        if shift.startswith("OFF"):
+            text = "หยุดวันอาทิตย์"
 
-            cell = ws.cell(row=row_idx, column=col_idx)
-            time_in = row.get("time_in", None)
+        else:
+            # --- 2) comment overrides everything ---
+            comment_str = None
+            if pd.notna(comment):
+                comment_str = str(comment).strip()
+                if not comment_str:
+                    comment_str = None
 
-            # ---------- choose text for that date cell ----------
-            if pd.notna(time_in):
-                # normal case: has time-in
-                cell.value = str(time_in)
-                total_matches += 1
+            if comment_str:
+                text = comment_str
+            elif reason_text:
+                text = reason_text
             else:
-                # no time-in
-                cell.fill = yellow_fill
+                text = "ขาดงาน"
 
-                shift = str(row.get("shift", "")).upper().strip()
+        edits[row_idx][col_idx] = (text, yellow_fill)
 
-                # --- 1) OFF day → หยุดวันอาทิตย์ ---
-                if shift.startswith("OFF"):
-                    cell.value = "หยุดวันอาทิตย์"
+    # ---------- add late minutes to 'สาย (นาที)' ----------
+    existing_late = {}
+    if late_by_row:
+        late_rows = ws.iter_rows(
+            min_row=HEADER_ROW + 1, min_col=late_col_idx, max_col=late_col_idx, values_only=True
+        )
+        existing_late = {r: v for r, (v,) in enumerate(late_rows, start=HEADER_ROW + 1)}
 
-                else:
-                    # --- 2) comment overrides everything ---
-                    comment_str = None
-                    if "comment" in row.index and pd.notna(row["comment"]):
-                        comment_str = str(row["comment"]).strip()
-                        if not comment_str:
-                            comment_str = None
-
-                    label_map = {
-                        "no_in": "ไม่ตอกเข้า",
-                        "no_out": "ไม่ตอกออก",
-                        "absent": "ขาดงาน",
-                        "sick": "ลาป่วย",
-                        "personal": "ลากิจ",
-                        "vacation": "พักร้อน",
-                        "ordination": "บวชคลอด",
-                    }
-
-                    pieces = []
-                    if comment_str is None:
-                        for key, label in label_map.items():
-                            if key not in row.index:
-                                continue
-                            val = row[key]
-                            if pd.isna(val):
-                                continue
-                            try:
-                                num = float(val)
-                            except (TypeError, ValueError):
-                                continue
-                            if num == 0:
-                                continue
-                            pieces.append(label if num == 1 else f"{label}({int(num)})")
-
-                    if comment_str:
-                        cell.value = comment_str
-                    elif pieces:
-                        cell.value = " ".join(pieces)
-                    else:
-                        cell.value = "ขาดงาน"
-
-            # ---------- accumulate late minutes ----------
-            if late_col_idx is not None and "late" in row.index:
-                late_val = row["late"]
-                if pd.notna(late_val):
-                    try:
-                        add_val = float(late_val)
-                    except (TypeError, ValueError):
-                        add_val = 0.0
-                    if add_val != 0.0:
-                        existing = ws.cell(row=row_idx, column=late_col_idx).value
-                        try:
-                            base = float(existing) if existing is not None else 0.0
-                        except (TypeError, ValueError):
-                            base = 0.0
-                        ws.cell(row=row_idx, column=late_col_idx).value = base + add_val
+    for row_idx, add_val in late_by_row.items():
+        if pd.isna(add_val) or add_val == 0.0:
+            continue
+        existing = existing_late.get(row_idx)
+        try:
+            base = float(existing) if existing is not None else 0.0
+        except (TypeError, ValueError):
+            base = 0.0
+        edits[row_idx][late_col_idx] = (base + add_val, None)
 
     print("Total cells filled with time_in:", total_matches)
 
+    # ---------- 3) Write edits into the sheet ----------
+    for row_idx, row_edits in edits.items():
+        for col_idx, (value, fill) in row_edits.items():
+            cell = ws.cell(row=row_idx, column=col_idx)
+            cell.value = value
+            if fill is not None:
+                cell.fill = fill
+
     # ---------- 4) Summary counts per person ----------
+    # read the whole date block once and test each keyword over it with np.char
     if any(summary_cols.values()):
-        for r in range(HEADER_ROW + 1, ws.max_row + 1):
-            counts = {k: 0 for k in summary_cols.keys()}
-
-            for col_idx in date_col_map.values():
-                v = ws.cell(row=r, column=col_idx).value
-                if v is None:
-                    continue
-                s = str(v)
-
-                if "ขาดงาน" in s:
-                    counts["absent"] += 1
-                if "ป่วย" in s:
-                    counts["sick"] += 1
-                if "กิจ" in s:
-                    counts["personal"] += 1
-                if "พักร้อน" in s:
-                    counts["vacation"] += 1
-                if "บวช" in s:
-                    counts["ordination"] += 1
-
-            for key, col in summary_cols.items():
-                if col is not None:
-                    ws.cell(row=r, column=col).value = counts[key]
-    last_data_row = HEADER_ROW
-
-    for r in range(HEADER_ROW + 1, ws.max_row + 1):
-        emp_id = ws.cell(row=r, column=ID_COL).value
-        if emp_id not in (None, "", 0):
-            last_data_row = r
-            continue
-
-        # check if any non-zero / non-empty exists in the row
-        row_has_data = False
-        for c in range(1, ws.max_column + 1):
-            v = ws.cell(row=r, column=c).value
-            if v not in (None, "", 0):
-                row_has_data = True
-                break
+        first_row = HEADER_ROW + 1
+        date_cols = sorted(date_col_map.values())
+        lo, hi = date_cols[0], date_cols[-1]
+
+        block = np.array(
+            list(ws.iter_rows(min_row=first_row, min_col=lo, max_col=hi, values_only=True)),
+            dtype=object,
+        ).reshape(-1, hi - lo + 1)
+        block = block[:, [c - lo for c in date_cols]]
+        block[np.equal(block, None)] = ""
+        text = block.astype(str)
+
+        counts = np.stack(
+            [(np.char.find(text, word) >= 0).sum(axis=1) for word in SUMMARY_WORDS.values()],
+            axis=1,
+        )
 
-        if row_has_data:
-            last_data_row = r
+        # (count index, sheet column) for the summary columns the template has
+        targets = [
+            (k, summary_cols[key])
+            for k, key in enumerate(SUMMARY_WORDS)
+            if summary_cols[key] is not None
+        ]
+        for r, row_counts in enumerate(counts.tolist(), start=first_row):
+            for k, col in targets:
+                ws.cell(row=r, column=col).value = row_counts[k]
+
+    # ---------- 5) Trim empty rows at the bottom, then save ----------
+    # scan values only, from the bottom up, stopping at the first row that
+    # has an employee ID or any non-zero / non-empty value
+    rows = list(ws.iter_rows(min_row=HEADER_ROW + 1, values_only=True))
+    last_data_row = HEADER_ROW
+    for offset in range(len(rows) - 1, -1, -1):
+        if any(v not in (None, "", 0) for v in rows[offset]):
+            last_data_row = HEADER_ROW + 1 + offset
+            break
 
     # delete rows below last_data_row
     if last_data_row < ws.max_row:
@@ -428,8 +507,9 @@ if st.button("Generate"):
         with TemporaryDirectory() as tmpdir:
             # save template
             template_path = os.path.join(tmpdir, "template.xlsx")
+            template_bytes = template_file.getvalue()
             with open(template_path, "wb") as f:
-                f.write(template_file.getbuffer())
+                f.write(template_bytes)
 
             # save each day file to temp folder
             day_paths = []
@@ -444,17 +524,17 @@ if st.button("Generate"):
 
             try:
                 with st.spinner("กำลังประมวลผล..."):
-                    fill_template_from_days(template_path, day_paths, output_path)
-
-                with open(output_path, "rb") as f:
-                    data = f.read()
+                    fill_template_from_days(
+                        template_path, day_paths, output_path, template_bytes=template_bytes
+                    )
 
                 st.success("สร้างไฟล์ template_filled.xlsx เรียบร้อยแล้ว 🎉")
-                st.download_button(
-                    label="⬇️ ดาวน์โหลด template_filled.xlsx",
-                    data=data,
-                    file_name="template_filled.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
+                with open(output_path, "rb") as f:
+                    st.download_button(
+                        label="⬇️ ดาวน์โหลด template_filled.xlsx",
+                        data=f,
+                        file_name="template_filled.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    )
             except Exception as e:
                 st.error(f"เกิดข้อผิดพลาดระหว่างการประมวลผล: {e}")